@@ -0,0 +1,15 @@
+import numpy as np
+from numba import njit
+
+# Numba kernels live outside main.py: Streamlit re-executes the main script on every
+# rerun, while an imported module is compiled once per process and stays loaded.
+
+@njit(cache=True, fastmath=True)
+def score_and_classify(values, warn, danger, offset, scale, weights):
+    # Fused health score and branchless status levels in a single pass
+    score = 0.0
+    status = np.empty(values.shape[0], dtype=np.int8)
+    for i in range(values.shape[0]):
+        score += weights[i] * (1 - abs(values[i] - offset[i]) / scale[i])
+        status[i] = (values[i] >= warn[i]) + (values[i] >= danger[i])
+    return score * 100, status
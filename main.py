@@ -3,9 +3,11 @@ import pandas as pd
 import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
+from kernels import score_and_classify
 from datetime import datetime, timedelta
+from collections import deque
+from itertools import islice
 import time
-import random
 
 # Page configuration
 st.set_page_config(
@@ -15,21 +17,32 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+MAX_POINTS = 100
+SENSOR_DTYPE = np.float32  # Sensor precision does not warrant 64-bit samples
+MAX_DISPLAY_POINTS = 1000
+MAX_ALERTS = 500
+MAX_REPORTS = 200
+
 # Initialize session states
 if 'monitoring_data' not in st.session_state:
     st.session_state.monitoring_data = {
-        'acoustic': [],
-        'vibration': [],
-        'temperature': [],
-        'humidity': [],
-        'timestamps': []
+        'acoustic': np.empty(MAX_POINTS, dtype=SENSOR_DTYPE),
+        'vibration': np.empty(MAX_POINTS, dtype=SENSOR_DTYPE),
+        'temperature': np.empty(MAX_POINTS, dtype=SENSOR_DTYPE),
+        'humidity': np.empty(MAX_POINTS, dtype=SENSOR_DTYPE),
+        'timestamps': np.empty(MAX_POINTS, dtype='datetime64[ms]')
     }
+    st.session_state.monitoring_head = 0
+    st.session_state.monitoring_count = 0
+    # Wall-clock epoch paired with a monotonic reading; ticks are stamped as offsets from it
+    st.session_state.clock_epoch = np.datetime64(datetime.now(), 'ms')
+    st.session_state.clock_start_ns = time.monotonic_ns()
 if 'monitoring_active' not in st.session_state:
     st.session_state.monitoring_active = False
 if 'reports' not in st.session_state:
-    st.session_state.reports = []
+    st.session_state.reports = deque(maxlen=MAX_REPORTS)
 if 'alerts' not in st.session_state:
-    st.session_state.alerts = []
+    st.session_state.alerts = deque(maxlen=MAX_ALERTS)
 
 # Constants
 STATIONS = {
@@ -37,6 +50,9 @@ STATIONS = {
     "Yellow Line": ["Samaypur Badli", "Kashmere Gate", "HUDA City Centre"],
     "Red Line": ["Rithala", "Kashmere Gate", "Dilshad Garden"],
 }
+# Stable option tuples for the sidebar selectboxes
+STATION_LINES = tuple(STATIONS)
+STATION_LISTS = {line: tuple(stations) for line, stations in STATIONS.items()}
 
 THRESHOLDS = {
     'acoustic': {'warning': 65, 'danger': 75, 'unit': 'dB', 'min': 40, 'max': 90},
@@ -45,8 +61,29 @@ THRESHOLDS = {
     'humidity': {'warning': 65, 'danger': 75, 'unit': '%', 'min': 30, 'max': 90}
 }
 
+# Per-metric threshold vectors, ordered as METRICS
+METRICS = ('acoustic', 'vibration', 'temperature', 'humidity')
+LOW = np.array([THRESHOLDS[m]['min'] for m in METRICS], dtype=SENSOR_DTYPE)
+HIGH = np.array([THRESHOLDS[m]['max'] for m in METRICS], dtype=SENSOR_DTYPE)
+WARN = np.array([THRESHOLDS[m]['warning'] for m in METRICS], dtype=SENSOR_DTYPE)
+DANGER = np.array([THRESHOLDS[m]['danger'] for m in METRICS], dtype=SENSOR_DTYPE)
+UNITS = tuple(THRESHOLDS[m]['unit'] for m in METRICS)
+
+# Health score weights and normalization, ordered as METRICS
+WEIGHTS = np.array([0.3, 0.3, 0.2, 0.2], dtype=SENSOR_DTYPE)
+NORM_OFFSET = np.array([40, 0, 25, 60], dtype=SENSOR_DTYPE)
+NORM_SCALE = np.array([50, 1, 15, 40], dtype=SENSOR_DTYPE)
+
+# Indexed by the status levels returned from evaluate_readings
+STATUS_LABELS = np.array(['good', 'warning', 'danger'])
+STATUS_WARNING, STATUS_DANGER = 1, 2
+
+# Single process-wide generator; readings are drawn as LOW + SPAN * U[0, 1)
+RNG = np.random.default_rng()
+SPAN = HIGH - LOW
+
 # Styling
-st.markdown("""
+CSS = """
 <style>
     .metric-card {
         background-color: white;
@@ -60,76 +97,161 @@ st.markdown("""
     .status-danger { color: #EF4444; }
     .metric-value { font-size: 1.5rem; font-weight: bold; }
     .metric-label { font-size: 1rem; color: #6B7280; }
+    .metric-row { display: flex; flex-wrap: wrap; gap: 1rem; }
+    .metric-row .metric-card { flex: 1; min-width: 12rem; }
     .alert-card {
         padding: 1rem;
         margin: 0.5rem 0;
         border-radius: 0.5rem;
     }
+    .alert-critical { background-color: #FEE2E2; }
+    .alert-warning { background-color: #FEF3C7; }
+    .alert-info { background-color: #DBEAFE; }
 </style>
-""", unsafe_allow_html=True)
+"""
+st.markdown(CSS, unsafe_allow_html=True)
+
+CARD_TPL = (
+    '<div class="metric-card">'
+    '<div class="metric-label">{label}</div>'
+    '<div class="metric-value status-{status}">{value:.1f} {unit}</div>'
+    '</div>'
+)
+
+ALERT_TPL = {
+    'CRITICAL': '<div class="alert-card alert-critical status-danger">🚨 {message} - {time}</div>',
+    'WARNING': '<div class="alert-card alert-warning status-warning">⚠ {message} - {time}</div>',
+    'INFO': '<div class="alert-card alert-info">ℹ {message} - {time}</div>',
+}
 
 # Utility functions
 def generate_sensor_data():
-    return {
-        'acoustic': random.uniform(THRESHOLDS['acoustic']['min'], THRESHOLDS['acoustic']['max']),
-        'vibration': random.uniform(THRESHOLDS['vibration']['min'], THRESHOLDS['vibration']['max']),
-        'temperature': random.uniform(THRESHOLDS['temperature']['min'], THRESHOLDS['temperature']['max']),
-        'humidity': random.uniform(THRESHOLDS['humidity']['min'], THRESHOLDS['humidity']['max'])
-    }
+    return LOW + SPAN * RNG.random(len(METRICS), dtype=SENSOR_DTYPE)
 
-def calculate_health_score(data):
-    weights = {'acoustic': 0.3, 'vibration': 0.3, 'temperature': 0.2, 'humidity': 0.2}
-    normalized_values = {
-        'acoustic': 1 - (data['acoustic'] - THRESHOLDS['acoustic']['min']) / 
-                   (THRESHOLDS['acoustic']['max'] - THRESHOLDS['acoustic']['min']),
-        'vibration': 1 - data['vibration'],
-        'temperature': 1 - abs(data['temperature'] - 25) / 15,
-        'humidity': 1 - abs(data['humidity'] - 60) / 40
-    }
-    return sum(normalized_values[key] * weights[key] for key in weights) * 100
+def evaluate_readings(values):
+    return score_and_classify(values, WARN, DANGER, NORM_OFFSET, NORM_SCALE, WEIGHTS)
 
-def get_status_color(value, metric):
-    if value >= THRESHOLDS[metric]['danger']:
-        return 'danger'
-    elif value >= THRESHOLDS[metric]['warning']:
-        return 'warning'
-    return 'good'
+def get_monitoring_view(key):
+    # Unroll the ring buffer into chronological order
+    buf = st.session_state.monitoring_data[key]
+    head = st.session_state.monitoring_head
+    return np.concatenate((buf[head:], buf[:head]))[-st.session_state.monitoring_count:]
+
+def get_latest_values():
+    idx = (st.session_state.monitoring_head - 1) % MAX_POINTS
+    return np.array([st.session_state.monitoring_data[metric][idx] for metric in METRICS], dtype=SENSOR_DTYPE)
+
+def downsample_lttb(x, y, n_out=MAX_DISPLAY_POINTS):
+    # Largest-Triangle-Three-Buckets: keep the endpoints and, per bucket, the point
+    # forming the largest triangle with the previous pick and the next bucket's mean
+    n = len(y)
+    if n <= n_out:
+        return x, y
+    xs = (x - x[0]).astype(np.float64)
+    ys = y.astype(np.float64)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    keep = np.empty(n_out, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        next_x = xs[end:next_end].mean()
+        next_y = ys[end:next_end].mean()
+        area = np.abs(
+            (xs[a] - next_x) * (ys[start:end] - ys[a])
+            - (xs[a] - xs[start:end]) * (next_y - ys[a])
+        )
+        a = start + int(np.argmax(area))
+        keep[i + 1] = a
+    return x[keep], y[keep]
+
+def build_health_gauge():
+    return go.Figure(go.Indicator(
+        mode="gauge+number",
+        value=0,
+        domain={'x': [0, 1], 'y': [0, 1]},
+        title={'text': "Track Health Score"},
+        gauge={
+            'axis': {'range': [0, 100]},
+            'bar': {'color': "darkblue"},
+            'steps': [
+                {'range': [0, 60], 'color': "lightpink"},
+                {'range': [60, 80], 'color': "lightyellow"},
+                {'range': [80, 100], 'color': "lightgreen"}
+            ]
+        }
+    ))
+
+def build_realtime_figure():
+    # One WebGL trace and one pair of threshold lines per metric, ordered as METRICS
+    fig = go.Figure([
+        go.Scattergl(x=[], y=[], name=metric.title(), mode='lines')
+        for metric in METRICS
+    ])
+    levels = [
+        (metric, THRESHOLDS[metric][level], color, level.title())
+        for metric in METRICS
+        for level, color in (('warning', "orange"), ('danger', "red"))
+    ]
+    # Horizontal threshold lines, equivalent to add_hline but set in one layout update
+    shapes = [
+        dict(type='line', xref='x domain', x0=0, x1=1, yref='y', y0=y, y1=y,
+             line=dict(color=color, dash='dash'))
+        for _, y, color, _ in levels
+    ]
+    annotations = [
+        dict(xref='x domain', x=1, xanchor='right', yref='y', y=y, yanchor='bottom',
+             text=f"{metric.title()} {label}", showarrow=False)
+        for metric, y, _, label in levels
+    ]
+    fig.update_layout(
+        shapes=shapes,
+        annotations=annotations,
+        height=500,
+        title="Real-time Sensor Data",
+        xaxis_title="Time",
+        yaxis_title="Value"
+    )
+    return fig
 
 def update_monitoring_data():
-    current_time = datetime.now()
-    new_data = generate_sensor_data()
-    
-    max_points = 100
-    for metric in new_data:
-        st.session_state.monitoring_data[metric].append(new_data[metric])
-        if len(st.session_state.monitoring_data[metric]) > max_points:
-            st.session_state.monitoring_data[metric] = st.session_state.monitoring_data[metric][-max_points:]
+    elapsed_ms = (time.monotonic_ns() - st.session_state.clock_start_ns) // 1_000_000
+    current_time = st.session_state.clock_epoch + np.timedelta64(elapsed_ms, 'ms')
+    values = generate_sensor_data()
     
-    st.session_state.monitoring_data['timestamps'].append(current_time)
-    if len(st.session_state.monitoring_data['timestamps']) > max_points:
-        st.session_state.monitoring_data['timestamps'] = st.session_state.monitoring_data['timestamps'][-max_points:]
-
-    # Generate alerts based on thresholds
-    for metric, value in new_data.items():
-        if value >= THRESHOLDS[metric]['danger']:
-            st.session_state.alerts.insert(0, {
+    # Write into the ring buffers at the cursor, overwriting the oldest sample
+    idx = st.session_state.monitoring_head
+    for i, metric in enumerate(METRICS):
+        st.session_state.monitoring_data[metric][idx] = values[i]
+    st.session_state.monitoring_data['timestamps'][idx] = current_time
+    st.session_state.monitoring_head = (idx + 1) % MAX_POINTS
+    st.session_state.monitoring_count = min(st.session_state.monitoring_count + 1, MAX_POINTS)
+
+    # Generate alerts based on thresholds; only metrics past a threshold are visited,
+    # so the common no-alert tick runs no loop iterations at all
+    _, status = evaluate_readings(values)
+    for i in np.flatnonzero(status):
+        metric = METRICS[i]
+        if status[i] == STATUS_DANGER:
+            st.session_state.alerts.appendleft({
                 'time': current_time,
                 'type': 'CRITICAL',
-                'message': f'High {metric} level detected: {value:.1f} {THRESHOLDS[metric]["unit"]}'
+                'message': f'High {metric} level detected: {values[i]:.1f} {UNITS[i]}'
             })
-        elif value >= THRESHOLDS[metric]['warning']:
-            st.session_state.alerts.insert(0, {
+        elif status[i] == STATUS_WARNING:
+            st.session_state.alerts.appendleft({
                 'time': current_time,
                 'type': 'WARNING',
-                'message': f'Elevated {metric} level: {value:.1f} {THRESHOLDS[metric]["unit"]}'
+                'message': f'Elevated {metric} level: {values[i]:.1f} {UNITS[i]}'
             })
 
 # Sidebar
 with st.sidebar:
     st.title("Track Monitor Controls")
     
-    selected_line = st.selectbox("Metro Line", list(STATIONS.keys()))
-    selected_station = st.selectbox("Station", STATIONS[selected_line])
+    selected_line = st.selectbox("Metro Line", STATION_LINES)
+    selected_station = st.selectbox("Station", STATION_LISTS[selected_line])
     
     st.divider()
     
@@ -144,10 +266,21 @@ with st.sidebar:
     update_interval = st.slider("Update Interval (seconds)", 1, 10, 1)
     
     if st.button("Clear Data"):
-        for key in st.session_state.monitoring_data:
-            st.session_state.monitoring_data[key] = []
+        st.session_state.monitoring_head = 0
+        st.session_state.monitoring_count = 0
         st.success("Data cleared")
 
+# Fragments rerun on their own timer while monitoring is active, so each tick
+# refreshes only the live panels instead of the whole script
+live_interval = update_interval if st.session_state.monitoring_active else None
+
+@st.fragment(run_every=live_interval)
+def capture_monitoring_data():
+    if st.session_state.monitoring_active:
+        update_monitoring_data()
+
+capture_monitoring_data()
+
 # Main content
 st.title("Track Health Monitoring Dashboard")
 st.markdown(f"*Currently Monitoring:* {selected_line} - {selected_station}")
@@ -161,52 +294,42 @@ tabs = st.tabs([
 ])
 
 # Overview Tab
-with tabs[0]:
-    if st.session_state.monitoring_data['acoustic']:
-        latest_data = {
-            metric: st.session_state.monitoring_data[metric][-1]
-            for metric in ['acoustic', 'vibration', 'temperature', 'humidity']
-        }
-        health_score = calculate_health_score(latest_data)
+@st.fragment(run_every=live_interval)
+def render_overview():
+    if st.session_state.monitoring_count:
+        latest_values = get_latest_values()
+        health_score, status = evaluate_readings(latest_values)
         
-        # Display health score with gauge
-        fig = go.Figure(go.Indicator(
-            mode="gauge+number",
-            value=health_score,
-            domain={'x': [0, 1], 'y': [0, 1]},
-            title={'text': "Track Health Score"},
-            gauge={
-                'axis': {'range': [0, 100]},
-                'bar': {'color': "darkblue"},
-                'steps': [
-                    {'range': [0, 60], 'color': "lightpink"},
-                    {'range': [60, 80], 'color': "lightyellow"},
-                    {'range': [80, 100], 'color': "lightgreen"}
-                ]
-            }
-        ))
-        st.plotly_chart(fig, use_container_width=True)
+        # Display health score with the cached gauge, updating only its value
+        if 'gauge_fig' not in st.session_state:
+            st.session_state.gauge_fig = build_health_gauge()
+        fig = st.session_state.gauge_fig
+        fig.data[0].value = health_score
+        st.plotly_chart(fig, use_container_width=True, key='health_gauge')
         
-        # Metrics display
-        cols = st.columns(4)
-        metrics = ['acoustic', 'vibration', 'temperature', 'humidity']
-        for col, metric in zip(cols, metrics):
-            with col:
-                status = get_status_color(latest_data[metric], metric)
-                st.markdown(f"""
-                <div class="metric-card">
-                    <div class="metric-label">{metric.title()}</div>
-                    <div class="metric-value status-{status}">
-                        {latest_data[metric]:.1f} {THRESHOLDS[metric]['unit']}
-                    </div>
-                </div>
-                """, unsafe_allow_html=True)
+        # Metrics display, rendered as a single row of cards
+        statuses = STATUS_LABELS[status]
+        cards = "".join(
+            CARD_TPL.format_map({
+                'label': metric.title(),
+                'status': status,
+                'value': value,
+                'unit': unit
+            })
+            for metric, status, value, unit in zip(METRICS, statuses, latest_values, UNITS)
+        )
+        st.markdown(f'<div class="metric-row">{cards}</div>', unsafe_allow_html=True)
     else:
         st.info("Waiting for monitoring data...")
 
+with tabs[0]:
+    render_overview()
+
 # Real-time Monitoring Tab
-with tabs[1]:
-    if st.session_state.monitoring_data['timestamps']:
+@st.fragment(run_every=live_interval)
+def render_realtime_monitoring():
+    if st.session_state.monitoring_count:
+        timestamps = get_monitoring_view('timestamps')
         st.subheader("Sensor Data Visualization")
         
         # Allow user to select metrics to display
@@ -216,40 +339,40 @@ with tabs[1]:
             default=['acoustic']
         )
         
-        # Create multi-line chart
-        fig = go.Figure()
-        for metric in selected_metrics:
-            fig.add_trace(go.Scatter(
-                x=st.session_state.monitoring_data['timestamps'],
-                y=st.session_state.monitoring_data[metric],
-                name=metric.title(),
-                mode='lines'
-            ))
-            
-            # Add threshold lines
-            fig.add_hline(
-                y=THRESHOLDS[metric]['warning'],
-                line_dash="dash",
-                line_color="orange",
-                annotation_text=f"{metric.title()} Warning"
-            )
-            fig.add_hline(
-                y=THRESHOLDS[metric]['danger'],
-                line_dash="dash",
-                line_color="red",
-                annotation_text=f"{metric.title()} Danger"
-            )
-        
-        fig.update_layout(
-            height=500,
-            title="Real-time Sensor Data",
-            xaxis_title="Time",
-            yaxis_title="Value"
-        )
-        st.plotly_chart(fig, use_container_width=True)
+        # Patch the cached multi-line chart in place instead of rebuilding it
+        if 'rt_fig' not in st.session_state:
+            st.session_state.rt_fig = build_realtime_figure()
+            st.session_state.rt_visible = None
+        fig = st.session_state.rt_fig
+        visible = tuple(metric in selected_metrics for metric in METRICS)
+        if visible != st.session_state.rt_visible:
+            # Selection changed: toggle traces and their threshold pairs in one layout update
+            st.session_state.rt_visible = visible
+            with fig.batch_update():
+                for trace, shown in zip(fig.data, visible):
+                    trace.visible = shown
+                    if not shown:
+                        # Hidden traces are neither unrolled nor downsampled; drop their stale samples
+                        trace.x, trace.y = (), ()
+                fig.update_layout({
+                    f'{prop}[{2 * i + k}].visible': shown
+                    for i, shown in enumerate(visible)
+                    for k in (0, 1)
+                    for prop in ('shapes', 'annotations')
+                })
+        with fig.batch_update():
+            for i, metric in enumerate(METRICS):
+                if visible[i]:
+                    fig.data[i].x, fig.data[i].y = downsample_lttb(
+                        timestamps, get_monitoring_view(metric).astype(SENSOR_DTYPE, copy=False)
+                    )
+        st.plotly_chart(fig, use_container_width=True, key='rt_chart')
     else:
         st.info("Waiting for monitoring data...")
 
+with tabs[1]:
+    render_realtime_monitoring()
+
 # Reports & Analysis Tab
 with tabs[2]:
     col1, col2 = st.columns(2)
@@ -280,26 +403,30 @@ with tabs[2]:
     
     with col2:
         st.subheader("Recent Reports")
-        for report in st.session_state.reports[::-1]:
+        for report in reversed(st.session_state.reports):
             with st.expander(f"{report['title']} ({report['time'].strftime('%Y-%m-%d %H:%M')})"):
                 st.write(f"*Type:* {report['type']}")
                 st.write(f"*Priority:* {report['priority']}")
                 st.write(f"*Description:* {report['description']}")
 
 # Alerts Tab
-with tabs[3]:
+@st.fragment(run_every=live_interval)
+def render_alerts():
     st.subheader("Recent Alerts")
     
-    for alert in st.session_state.alerts[:10]:  # Show last 10 alerts
-        if alert['type'] == 'CRITICAL':
-            st.error(f"🚨 {alert['message']} - {alert['time'].strftime('%H:%M:%S')}")
-        elif alert['type'] == 'WARNING':
-            st.warning(f"⚠ {alert['message']} - {alert['time'].strftime('%H:%M:%S')}")
-        else:
-            st.info(f"ℹ {alert['message']} - {alert['time'].strftime('%H:%M:%S')}")
+    alerts = list(islice(st.session_state.alerts, 10))  # Show last 10 alerts
+    if alerts:
+        # Format all visible timestamps in one call
+        alert_times = np.datetime_as_string(
+            np.array([alert['time'] for alert in alerts], dtype='datetime64[ms]'), unit='s'
+        )
+        st.markdown("".join(
+            ALERT_TPL.get(alert['type'], ALERT_TPL['INFO']).format(
+                message=alert['message'],
+                time=alert_time[11:19]  # YYYY-MM-DDTHH:MM:SS -> HH:MM:SS
+            )
+            for alert, alert_time in zip(alerts, alert_times)
+        ), unsafe_allow_html=True)
 
-# Update data if monitoring is active
-if st.session_state.monitoring_active:
-    update_monitoring_data()
-    time.sleep(update_interval)
-    st.rerun()
\ No newline at end of file
+with tabs[3]:
+    render_alerts()
\ No newline at end of file